@@ -32,6 +32,9 @@ app.secret_key = os.getenv('SECRET_KEY', 'fallback-secret-key')
 download_progress = {}
 download_lock = threading.Lock()
 
+# Shared downloader so info fetched for the format list is reused by the download
+downloader = YouTubeDownloader()
+
 def get_downloads_folder():
     """Get the system downloads folder with fallback"""
     try:
@@ -62,7 +65,6 @@ def fetch_formats():
             return jsonify({'error': 'URL is required'}), 400
         
         logger.info(f"Fetching formats for URL: {url}")
-        downloader = YouTubeDownloader()
         video_info = downloader.get_video_info(url)
         
         if not video_info:
@@ -114,7 +116,6 @@ def download():
                     }
                 
                 logger.info(f"Starting download {download_id} for URL: {url}, Format: {format_id}, Type: {download_type}")
-                downloader = YouTubeDownloader()
                 
                 downloads_folder = get_downloads_folder()
                 filepath = downloader.download(
@@ -1,89 +1,523 @@
 import os
 import json
+import shutil
+import socket
+import tempfile
+import time
+import threading
+import atexit
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager, nullcontext
+from http.cookiejar import MozillaCookieJar, LoadError
+from operator import itemgetter
+from types import MappingProxyType
 import yt_dlp
 import ffmpeg
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlunparse, urlencode, parse_qsl
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# How long extracted video info stays reusable (seconds)
+INFO_CACHE_TTL = 300
+INFO_CACHE_SIZE = 256
+
+# Default number of videos download_many() fetches at once
+DOWNLOAD_CONCURRENCY = 4
+
+# Most idle YoutubeDL instances kept alive for reuse
+YDL_POOL_SIZE = 8
+
+# Translation table deleting characters not allowed in filenames, including control characters
+_FN_STRIP = str.maketrans('', '', '<>:"/\\|?*' + ''.join(map(chr, range(32))))
+MAX_FILENAME_BYTES = 255
+
+# Height in an upper-cased resolution string like "1080P60"
+_HEIGHT_RE = re.compile(r'(\d+)P')
+
+# Named resolutions that carry no pixel height (read-only)
+RESOLUTION_MAP = MappingProxyType({
+    '4K': 2160, '2K': 1440,
+    'BEST': 10000, 'N/A': 0, 'MP3 AUDIO (192KBPS)': 1
+})
+
+SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+# Format type indexed by (has_video << 1) | has_audio
+FORMAT_TYPES = ('unknown', 'audio', 'video', 'video+audio')
+
+# Audio-only streams below this bitrate (kbps) are not offered
+MIN_AUDIO_ABR = 50
+
+# Extensions a merged or remuxed download may end up with, in order of preference
+FALLBACK_EXTENSIONS = ('.mp4', '.mkv', '.webm', '.m4a')
+
+BYTES_TO_MB = 1 / (1024 * 1024)
+
+# Minimum seconds between progress updates for the same file
+PROGRESS_MIN_INTERVAL = 0.1
+
+# Places to look for a Netscape cookies file, in order
+COOKIES_PATHS = (
+    'cookies.txt',
+    'cookies/cookies.txt',
+    os.path.expanduser('~/.config/yt-dlp/cookies.txt'),
+    '/etc/yt-dlp/cookies.txt',
+)
+
+@functools.cache
+def _find_cookies_file():
+    """Return the first cookies file found, checked once per process"""
+    env_path = os.getenv('YT_DLP_COOKIES')
+    if env_path:
+        if os.path.isfile(env_path):
+            logger.info("Using cookies file from YT_DLP_COOKIES: %s", env_path)
+            return env_path
+        logger.warning("YT_DLP_COOKIES points to a missing file: %s", env_path)
+    
+    for path in COOKIES_PATHS:
+        if os.path.isfile(path):
+            logger.info("Found cookies file: %s", path)
+            return path
+    
+    logger.info("No cookies file found, proceeding without cookies")
+    return None
+
+@functools.lru_cache(maxsize=None)
+def _load_cookie_jar(cookies_file):
+    """Parse a cookies file into a MozillaCookieJar, once per path"""
+    jar = MozillaCookieJar(cookies_file)
+    if cookies_file:
+        try:
+            jar.load(ignore_discard=True, ignore_expires=True)
+        except (LoadError, OSError) as e:
+            logger.warning("Could not load cookies from %s: %s", cookies_file, e)
+    return jar
+
+# Fixed entries added to every format list; read-only, so each listing gets its own copies
+MP3_FORMAT = MappingProxyType({
+    'format_id': 'mp3',
+    'ext': 'mp3',
+    'resolution': 'MP3 Audio (192kbps)',
+    'filesize': 'Unknown',
+    'type': 'audio',
+    'quality': 1
+})
+ULTRA_4K_FORMAT = MappingProxyType({
+    'format_id': 'bestvideo[height>=2160]+bestaudio/best[height>=2160]',
+    'ext': 'mp4',
+    'resolution': '4K ULTRA (+AUDIO)',
+    'filesize': 'Unknown',
+    'type': 'video+audio',
+    'quality': 5000
+})
+AUTO_FORMATS = (
+    MappingProxyType({
+        'format_id': 'best',
+        'ext': 'mp4',
+        'resolution': 'BEST (Auto Select)',
+        'filesize': 'Unknown',
+        'type': 'video+audio',
+        'quality': 10000
+    }),
+    MappingProxyType({
+        'format_id': 'bestvideo+bestaudio',
+        'ext': 'mp4',
+        'resolution': 'BEST VIDEO + BEST AUDIO (4K Ready)',
+        'filesize': 'Unknown',
+        'type': 'video+audio',
+        'quality': 15000
+    }),
+    MappingProxyType({
+        'format_id': 'bestvideo[height<=1080]+bestaudio/best[height<=1080]',
+        'ext': 'mp4',
+        'resolution': '1080p MAX (Auto Merge)',
+        'filesize': 'Unknown',
+        'type': 'video+audio',
+        'quality': 1080
+    }),
+    MappingProxyType({
+        'format_id': 'bestvideo[height<=2160]+bestaudio/best[height<=2160]',
+        'ext': 'mp4',
+        'resolution': '4K MAX (Auto Merge)',
+        'filesize': 'Unknown',
+        'type': 'video+audio',
+        'quality': 2160
+    })
+)
+
+# Extractor options per platform domain, looked up by get_extractor_opts()
+_YT_OPTS = {
+    'extractor_args': {
+        'youtube': {
+            'player_client': ['web', 'android', 'ios'],  # Multiple clients for 4K
+            'player_skip': ['configs'],
+            'formats': ['best', '4k', '1080p', '720p', '480p', '360p']  # Explicitly request 4K
+        }
+    }
+}
+_FB_OPTS = {
+    'extractor_args': {
+        'facebook': {
+            'credentials': None
+        }
+    }
+}
+_IG_OPTS = {
+    'extractor_args': {
+        'instagram': {
+            'shortcode_match': True
+        }
+    }
+}
+PLATFORM_OPTS = {
+    'youtube.com': _YT_OPTS,
+    'youtu.be': _YT_OPTS,
+    'facebook.com': _FB_OPTS,
+    'fb.com': _FB_OPTS,
+    'instagram.com': _IG_OPTS,
+}
+
+# Format listing skips YouTube's HLS manifests; DASH still provides every
+# resolution up to 4K, so only the download path fetches everything
+_YT_INFO_OPTS = {
+    'extractor_args': {
+        'youtube': {
+            **_YT_OPTS['extractor_args']['youtube'],
+            'skip': ['hls'],
+        }
+    }
+}
+
+@functools.lru_cache(maxsize=256)
+def _parse_url(url):
+    """Parse a URL once; the same URL is parsed several times per request"""
+    if '//' not in url:
+        url = '//' + url
+    return urlparse(url)
+
+# yt-dlp resolves the same few hosts (youtube.com, googlevideo.com, i.ytimg.com)
+# many times per video, so resolutions are reused for a few minutes
+DNS_CACHE_TTL = 300
+DNS_CACHE_SIZE = 256
+_dns_cache = OrderedDict()
+_dns_cache_lock = threading.Lock()
+_original_getaddrinfo = socket.getaddrinfo
+
+def _cached_getaddrinfo(*args, **kwargs):
+    """socket.getaddrinfo with a small in-process TTL cache; failures are not cached"""
+    key = (args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _dns_cache_lock:
+        entry = _dns_cache.get(key)
+        if entry and now - entry[0] < DNS_CACHE_TTL:
+            _dns_cache.move_to_end(key)
+            return list(entry[1])
+    
+    result = _original_getaddrinfo(*args, **kwargs)
+    with _dns_cache_lock:
+        _dns_cache[key] = (now, result)
+        _dns_cache.move_to_end(key)
+        while len(_dns_cache) > DNS_CACHE_SIZE:
+            _dns_cache.popitem(last=False)
+    return list(result)
+
 class YouTubeDownloader:
+    # socket.getaddrinfo is patched once per process, by the first instance
+    _dns_cache_installed = False
+    
     def __init__(self):
-        self.supported_domains = [
+        self.install_dns_cache()
+        self.supported_domains = frozenset({
             'youtube.com', 'youtu.be', 'tiktok.com', 'vm.tiktok.com',
             'instagram.com', 'fb.com', 'facebook.com', 'www.tiktok.com',
             'www.instagram.com', 'www.facebook.com'
-        ]
+        })
         self.cookies_file = self.get_cookies_file()
+        self._jar = self.load_cookie_jar()
+        self.aria2c_path = shutil.which('aria2c')
+        
+        # LRU of extracted info keyed by canonical URL, so repeat lookups and
+        # download() can skip a second extraction
+        self._info_cache = OrderedDict()
+        self._info_cache_lock = threading.Lock()
+        # Idle YoutubeDL instances keyed by option signature; reusing them keeps
+        # HTTP connections and the player-JS cache alive between calls
+        self._ydl_pool = OrderedDict()
+        self._ydl_idle_count = 0
+        self._ydl_instances = []
+        self._ydl_pool_lock = threading.Lock()
+        # Cached progress-hook values keyed by the file being downloaded
+        self._hook_state = {}
+        atexit.register(self.close)
+    
+    @classmethod
+    def install_dns_cache(cls):
+        """Route socket.getaddrinfo through the DNS cache"""
+        if not cls._dns_cache_installed:
+            socket.getaddrinfo = _cached_getaddrinfo
+            cls._dns_cache_installed = True
+    
+    def close(self):
+        """Close all pooled YoutubeDL instances"""
+        with self._ydl_pool_lock:
+            instances = self._ydl_instances
+            self._ydl_instances = []
+            self._ydl_pool = OrderedDict()
+            self._ydl_idle_count = 0
+        for ydl in instances:
+            self.close_ydl(ydl)
+    
+    def close_ydl(self, ydl):
+        """Close a YoutubeDL instance, logging rather than raising on failure"""
+        try:
+            ydl.close()
+        except Exception as e:
+            logger.warning("Error closing YoutubeDL instance: %s", e)
+    
+    def get_opts_key(self, opts):
+        """Build a hashable signature for a set of yt-dlp options"""
+        return frozenset(
+            (key, json.dumps(value, sort_keys=True, default=repr))
+            for key, value in opts.items()
+        )
+    
+    @contextmanager
+    def pooled_ydl(self, opts):
+        """Check out a YoutubeDL instance for the given options, creating one if none is idle"""
+        opts = dict(opts)
+        # Progress hooks are per download, so they are swapped in rather than part of the key
+        progress_hooks = opts.pop('progress_hooks', [])
+        key = self.get_opts_key(opts)
+        
+        with self._ydl_pool_lock:
+            idle = self._ydl_pool.get(key)
+            ydl = idle.pop() if idle else None
+            if ydl is not None:
+                self._ydl_idle_count -= 1
+                # Eviction expects every listed key to have an idle instance
+                if not idle:
+                    del self._ydl_pool[key]
+        
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(opts)
+            with self._ydl_pool_lock:
+                self._ydl_instances.append(ydl)
+        
+        ydl._progress_hooks = list(progress_hooks)
+        try:
+            yield ydl
+        finally:
+            ydl._progress_hooks = []
+            self.release_ydl(key, ydl)
+    
+    def release_ydl(self, key, ydl):
+        """Return an instance to the pool, closing the least recently used idle ones over the limit"""
+        evicted = []
+        with self._ydl_pool_lock:
+            self._ydl_pool.setdefault(key, []).append(ydl)
+            self._ydl_pool.move_to_end(key)
+            self._ydl_idle_count += 1
+            
+            # Each download format/folder gets its own signature, so cap what stays alive
+            while self._ydl_idle_count > YDL_POOL_SIZE:
+                oldest_key, oldest_idle = next(iter(self._ydl_pool.items()))
+                evicted.append(oldest_idle.pop(0))
+                if not oldest_idle:
+                    del self._ydl_pool[oldest_key]
+                self._ydl_idle_count -= 1
+            
+            for old_ydl in evicted:
+                self._ydl_instances.remove(old_ydl)
+        
+        for old_ydl in evicted:
+            self.close_ydl(old_ydl)
     
     def get_cookies_file(self):
         """Find and return the cookies file path"""
-        possible_paths = [
-            'cookies.txt',
-            'cookies/cookies.txt', 
-            os.path.expanduser('~/.config/yt-dlp/cookies.txt'),
-            '/etc/yt-dlp/cookies.txt'
-        ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
-                logger.info(f"Found cookies file: {path}")
-                return path
-        
-        logger.info("No cookies file found, proceeding without cookies")
-        return None
+        return _find_cookies_file()
+    
+    def load_cookie_jar(self):
+        """Return the parsed cookies file, shared by all instances in the process"""
+        return _load_cookie_jar(self.cookies_file)
+    
+    def parse_url(self, url):
+        """Parse a URL, treating scheme-less input like 'youtube.com/...' as a host"""
+        return _parse_url(url)
+    
+    def get_host(self, url):
+        """Return the lowercase hostname of a URL without a leading www."""
+        host = self.parse_url(url).hostname or ''
+        return host[4:] if host.startswith('www.') else host
+    
+    def is_supported(self, url):
+        """Check whether a URL belongs to a supported domain or one of its subdomains"""
+        host = self.get_host(url)
+        return host in self.supported_domains or any(
+            host.endswith('.' + domain) for domain in self.supported_domains
+        )
+    
+    def get_platform_domain(self, url):
+        """Map a URL to its key in the platform options (m.facebook.com -> facebook.com)"""
+        host = self.get_host(url)
+        if host in PLATFORM_OPTS:
+            return host
+        parent = host.split('.', 1)[-1]
+        return parent if parent in PLATFORM_OPTS else None
     
     def fix_shorts_url(self, url):
         """Fix YouTube Shorts URLs to regular watch URLs"""
-        if 'youtube.com/shorts/' in url:
-            video_id = url.split('/')[-1].split('?')[0]
-            return f'https://www.youtube.com/watch?v={video_id}'
+        parsed = self.parse_url(url)
+        if self.get_platform_domain(url) != 'youtube.com':
+            return url
+        
+        path_parts = [part for part in parsed.path.split('/') if part]
+        if len(path_parts) >= 2 and path_parts[0] == 'shorts':
+            return f'https://www.youtube.com/watch?v={path_parts[1]}'
         return url
     
     def sanitize_filename(self, filename):
         """Remove invalid characters from filename"""
-        filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-        if len(filename) > 100:
-            filename = filename[:100]
+        filename = filename.translate(_FN_STRIP)[:100]
+        # Keep multi-byte titles within the 255-byte filesystem name limit
+        filename = filename.encode('utf-8')[:MAX_FILENAME_BYTES].decode('utf-8', 'ignore')
         return filename.strip()
     
+    def canonicalize_url(self, url):
+        """Normalise a URL for cache keys: Shorts fixed, lowercase host, sorted query"""
+        parsed = self.parse_url(self.fix_shorts_url(url))
+        if not parsed.hostname:
+            return url
+        query = urlencode(sorted(parse_qsl(parsed.query)))
+        return urlunparse(((parsed.scheme or 'https').lower(), parsed.hostname, parsed.path, '', query, ''))
+    
+    def cache_info(self, url, info):
+        """Store extracted info for later reuse by get_video_info() and download()"""
+        key = self.canonicalize_url(url)
+        # Drop the default format selection (requested_formats etc.) so a cached
+        # download re-selects for the chosen format, as --load-info-json does
+        info = yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=True)
+        with self._info_cache_lock:
+            self._info_cache[key] = (time.time(), info)
+            self._info_cache.move_to_end(key)
+            while len(self._info_cache) > INFO_CACHE_SIZE:
+                self._info_cache.popitem(last=False)
+    
+    def get_cached_info(self, url):
+        """Return cached info for a URL if it has not expired"""
+        key = self.canonicalize_url(url)
+        with self._info_cache_lock:
+            entry = self._info_cache.get(key)
+            if not entry:
+                return None
+            cached_at, info = entry
+            if time.time() - cached_at > INFO_CACHE_TTL:
+                del self._info_cache[key]
+                return None
+            self._info_cache.move_to_end(key)
+            return info
+    
+    def invalidate_info(self, url):
+        """Drop cached info for a URL, e.g. after its format URLs stopped working"""
+        key = self.canonicalize_url(url)
+        with self._info_cache_lock:
+            self._info_cache.pop(key, None)
+    
+    def load_info_json(self, url, info_path):
+        """Cache the contents of an .info.json written during a download"""
+        try:
+            with open(info_path, 'r', encoding='utf-8') as f:
+                self.cache_info(url, json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read info file %s: %s", info_path, e)
+    
     def get_video_info(self, url):
         """Get video information and available formats"""
         try:
             # Fix YouTube Shorts URLs
             url = self.fix_shorts_url(url)
             
+            # Serve recently extracted info without touching the network
+            cached_info = self.get_cached_info(url)
+            if cached_info:
+                logger.info("Using cached video info for: %s", url)
+                return self.build_video_info(url, cached_info)
+            
             # Get extractor options
-            ydl_opts = self.get_extractor_opts(url)
+            ydl_opts = self.get_info_opts(url)
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Get full info with processing
-                info = ydl.extract_info(url, download=False)
-                
-                if not info:
-                    return None
-                
-                # Extract basic video info
-                video_info = {
-                    'title': self.sanitize_filename(info.get('title', 'Unknown Title')),
-                    'thumbnail': info.get('thumbnail', ''),
-                    'duration': self.format_duration(info.get('duration', 0)),
-                    'uploader': info.get('uploader', 'Unknown Uploader'),
-                    'webpage_url': info.get('webpage_url', url),
-                    'formats': []
-                }
-                
-                # Extract available formats
-                formats = self.extract_formats(info)
-                video_info['formats'] = formats
-                
-                logger.info(f"Found {len(formats)} formats for: {video_info['title']}")
-                return video_info
+            with self.pooled_ydl(ydl_opts) as ydl:
+                return self.extract_video_info(ydl, url)
                 
         except Exception as e:
-            logger.error(f"Error getting video info: {str(e)}")
+            logger.error("Error getting video info: %s", e)
+            return None
+    
+    def get_video_info_many(self, urls):
+        """Get video information for several URLs, sharing one YoutubeDL per host"""
+        results = {}
+        groups = defaultdict(list)
+        for url in urls:
+            fixed_url = self.fix_shorts_url(url)
+            # Serve recently extracted info without touching the network
+            cached_info = self.get_cached_info(fixed_url)
+            if cached_info:
+                logger.info("Using cached video info for: %s", fixed_url)
+                results[url] = self.build_video_info(fixed_url, cached_info)
+            else:
+                groups[self.get_host(fixed_url)].append((url, fixed_url))
+        
+        for host, host_urls in groups.items():
+            try:
+                ydl_opts = self.get_info_opts(host_urls[0][1])
+                with self.pooled_ydl(ydl_opts) as ydl:
+                    for url, fixed_url in host_urls:
+                        try:
+                            results[url] = self.extract_video_info(ydl, fixed_url)
+                        except Exception as e:
+                            logger.error("Error getting video info for %s: %s", url, e)
+                            results[url] = None
+            except Exception as e:
+                # A failure setting up the host's instance leaves the rest of its URLs unresolved
+                logger.error("Error getting video info for host %s: %s", host, e)
+                for url, _ in host_urls:
+                    results.setdefault(url, None)
+        
+        return results
+    
+    def extract_video_info(self, ydl, url):
+        """Extract info for one URL with the given YoutubeDL and build the video info dict"""
+        # Get full info with processing
+        info = ydl.extract_info(url, download=False)
+        
+        if not info:
             return None
+        
+        self.cache_info(url, info)
+        return self.build_video_info(url, info)
+    
+    def build_video_info(self, url, info):
+        """Build the video info dict returned to callers from a yt-dlp info dict"""
+        # Extract basic video info
+        video_info = {
+            'title': self.sanitize_filename(info.get('title', 'Unknown Title')),
+            'thumbnail': info.get('thumbnail', ''),
+            'duration': self.format_duration(info.get('duration', 0)),
+            'uploader': info.get('uploader', 'Unknown Uploader'),
+            'webpage_url': info.get('webpage_url', url),
+            'formats': []
+        }
+        
+        # Extract available formats
+        formats = self.extract_formats(info)
+        video_info['formats'] = formats
+        
+        logger.info("Found %d formats for: %s", len(formats), video_info['title'])
+        return video_info
     
     def get_extractor_opts(self, url):
         """Get extractor options based on platform"""
@@ -91,252 +525,192 @@ class YouTubeDownloader:
             'quiet': True,
             'no_warnings': False,
             'extract_flat': False,
+            # Keep connections open so pooled YoutubeDL instances and fragment
+            # downloads reuse them instead of paying a new TLS handshake
+            'http_headers': {'Connection': 'keep-alive'},
         }
         
         # Add cookies if available
         if self.cookies_file:
             opts['cookiefile'] = self.cookies_file
-            logger.info(f"Using cookies file: {self.cookies_file}")
-        
-        # YouTube specific options - 4K support enabled
-        if 'youtube.com' in url or 'youtu.be' in url:
-            opts.update({
-                'extractor_args': {
-                    'youtube': {
-                        'player_client': ['web', 'android', 'ios'],  # Multiple clients for 4K
-                        'player_skip': ['configs'],
-                        'formats': ['best', '4k', '1080p', '720p', '480p', '360p']  # Explicitly request 4K
-                    }
-                }
-            })
-        
-        # Facebook specific options
-        elif 'facebook.com' in url or 'fb.com' in url:
-            opts.update({
-                'extractor_args': {
-                    'facebook': {
-                        'credentials': None
-                    }
-                }
-            })
+            logger.info("Using cookies file: %s", self.cookies_file)
         
-        # Instagram specific options  
-        elif 'instagram.com' in url:
-            opts.update({
-                'extractor_args': {
-                    'instagram': {
-                        'shortcode_match': True
-                    }
-                }
-            })
+        # Platform specific options
+        platform_opts = PLATFORM_OPTS.get(self.get_platform_domain(url))
+        if platform_opts:
+            opts.update(platform_opts)
         
         return opts
     
+    def get_info_opts(self, url):
+        """Get extractor options for listing formats without downloading"""
+        opts = self.get_extractor_opts(url)
+        if self.get_platform_domain(url) in ('youtube.com', 'youtu.be'):
+            opts.update(_YT_INFO_OPTS)
+        return opts
+    
     def extract_formats(self, info):
         """Extract and organize all available formats with 4K support"""
         formats = []
         
         # Add best MP3 audio format
-        formats.append({
-            'format_id': 'mp3',
-            'ext': 'mp3',
-            'resolution': 'MP3 Audio (192kbps)',
-            'filesize': 'Unknown',
-            'type': 'audio',
-            'quality': 1
-        })
+        formats.append(dict(MP3_FORMAT))
         
-        # Process each format
+        # Process each format in one pass, also collecting video-only streams for merging
+        seen = set()
+        merge_candidates = []
         for f in info.get('formats', []):
-            format_info = self.create_format_info(f)
-            if format_info and self.is_valid_format(format_info):
-                formats.append(format_info)
+            _get = f.get
+            # Skip storyboards and streams with neither video nor audio before building a dict
+            if _get('format_id', '').startswith('sb'):
+                continue
+            has_video = _get('vcodec') != 'none'
+            has_audio = _get('acodec') != 'none'
+            if not has_video and not has_audio:
+                continue
+            
+            # Skip very low quality audio-only streams
+            if not has_video and (_get('abr') or 0) < MIN_AUDIO_ABR:
+                continue
+            
+            # Video-only formats from 360p to 4K can be merged with the best audio
+            if has_video and not has_audio and (_get('height') or 0) >= 360:
+                merge_candidates.append(f)
+            
+            # Formats with the same displayed resolution, type and quality would show
+            # up as identical entries, so only the first one is kept
+            resolution = self.get_resolution(f)
+            quality = self.get_quality_value(resolution, f)
+            key = (resolution, has_video, has_audio, quality)
+            if key in seen:
+                continue
+            
+            seen.add(key)
+            formats.append(self.create_format_info(f, resolution, quality))
         
         # Add combined formats for ALL quality videos including 4K
-        combined_formats = self.create_combined_formats(info.get('formats', []))
+        combined_formats = self.create_combined_formats(merge_candidates)
         formats.extend(combined_formats)
         
         # Add auto formats
-        formats.extend([
-            {
-                'format_id': 'best',
-                'ext': 'mp4',
-                'resolution': 'BEST (Auto Select)',
-                'filesize': 'Unknown',
-                'type': 'video+audio',
-                'quality': 10000
-            },
-            {
-                'format_id': 'bestvideo+bestaudio',
-                'ext': 'mp4',
-                'resolution': 'BEST VIDEO + BEST AUDIO (4K Ready)',
-                'filesize': 'Unknown',
-                'type': 'video+audio',
-                'quality': 15000
-            },
-            {
-                'format_id': 'bestvideo[height<=1080]+bestaudio/best[height<=1080]',
-                'ext': 'mp4',
-                'resolution': '1080p MAX (Auto Merge)',
-                'filesize': 'Unknown',
-                'type': 'video+audio',
-                'quality': 1080
-            },
-            {
-                'format_id': 'bestvideo[height<=2160]+bestaudio/best[height<=2160]',
-                'ext': 'mp4',
-                'resolution': '4K MAX (Auto Merge)',
-                'filesize': 'Unknown',
-                'type': 'video+audio',
-                'quality': 2160
-            }
-        ])
+        formats.extend(dict(f) for f in AUTO_FORMATS)
         
-        # Remove duplicates and sort
-        return self.deduplicate_and_sort_formats(formats)
+        # Duplicates were skipped while building the list, so only sort
+        return self.sort_formats(formats)
     
-    def create_format_info(self, format_dict):
-        """Create standardized format info"""
-        format_note = format_dict.get('format_note', 'unknown')
-        if format_note == 'unknown' and format_dict.get('height'):
-            format_note = f"{format_dict['height']}p"
+    def get_resolution(self, format_dict):
+        """Build the upper-case resolution label shown for a format"""
+        # Audio-only streams are told apart by bitrate, not by their format note
+        abr = format_dict.get('abr')
+        if abr and format_dict.get('vcodec') == 'none':
+            return f"{round(abr)}kbps"
         
-        # Skip storyboard formats
-        if format_dict.get('format_id', '').startswith('sb'):
-            return None
+        height = format_dict.get('height') or 0
+        
+        format_note = format_dict.get('format_note', 'unknown')
+        if format_note == 'unknown' and height:
+            format_note = f"{height}p"
         
         # Detect 4K formats
-        height = format_dict.get('height', 0)
         if height >= 2160:
             format_note = f"{height}p (4K)"
         elif height >= 1440:
             format_note = f"{height}p (2K)"
         
+        # Upper-case once; get_quality_value() expects this form
+        return format_note.upper() if format_note != 'unknown' else 'N/A'
+    
+    def create_format_info(self, format_dict, resolution=None, quality=None):
+        """Create standardized format info"""
+        _g = format_dict.get
+        has_video = _g('vcodec') != 'none'
+        has_audio = _g('acodec') != 'none'
+        
+        if resolution is None:
+            resolution = self.get_resolution(format_dict)
+        if quality is None:
+            quality = self.get_quality_value(resolution, format_dict)
+        
         return {
             'format_id': format_dict['format_id'],
-            'ext': format_dict.get('ext', 'mp4'),
-            'resolution': format_note.upper() if format_note != 'unknown' else 'N/A',
-            'filesize': self.format_filesize(format_dict.get('filesize')),
-            'type': self.get_format_type(format_dict),
-            'quality': self.get_quality_value(format_note, format_dict),
-            'has_audio': format_dict.get('acodec') != 'none',
-            'has_video': format_dict.get('vcodec') != 'none',
+            'ext': _g('ext', 'mp4'),
+            'resolution': resolution,
+            'filesize': self.format_filesize(_g('filesize')),
+            'type': FORMAT_TYPES[(has_video << 1) | has_audio],
+            'quality': quality,
+            'has_audio': has_audio,
+            'has_video': has_video,
         }
     
-    def get_format_type(self, format_dict):
-        """Determine format type"""
-        has_video = format_dict.get('vcodec') != 'none'
-        has_audio = format_dict.get('acodec') != 'none'
-        
-        if has_video and has_audio:
-            return 'video+audio'
-        elif has_video:
-            return 'video'
-        elif has_audio:
-            return 'audio'
-        else:
-            return 'unknown'
-    
-    def is_valid_format(self, format_info):
-        """Check if format should be included"""
-        # Skip formats without video or audio
-        if not format_info['has_video'] and not format_info['has_audio']:
-            return False
-        
-        # Skip very low quality audio
-        if format_info['type'] == 'audio' and format_info.get('abr', 0) < 50:
-            return False
-            
-        return True
-    
-    def create_combined_formats(self, all_formats):
-        """Create combined formats for ALL quality videos including 4K"""
+    def create_combined_formats(self, video_formats):
+        """Create combined formats for ALL quality videos including 4K from video-only formats of 360p and up"""
         combined = []
         
-        # Find best video-only and audio-only formats
-        video_formats = [f for f in all_formats if f.get('vcodec') != 'none' and f.get('acodec') == 'none']
-        audio_formats = [f for f in all_formats if f.get('acodec') != 'none' and f.get('vcodec') == 'none']
+        # Highest resolution first
+        video_formats = sorted(video_formats, key=itemgetter('height'), reverse=True)
         
-        # Sort video formats by quality (highest first)
-        video_formats.sort(key=lambda x: x.get('height', 0), reverse=True)
-        
-        # Create combined formats for all high-quality video formats
+        # Create combined formats for all high-quality video formats, one per height
+        seen_heights = set()
         for video_fmt in video_formats:
-            height = video_fmt.get('height', 0)
-            if height >= 360:  # Include all formats from 360p to 4K
-                combined.append({
-                    'format_id': f"{video_fmt['format_id']}+bestaudio",
-                    'ext': 'mp4',
-                    'resolution': f"{height}p (+AUDIO)",
-                    'filesize': 'Unknown',
-                    'type': 'video+audio',
-                    'quality': height + 1000
-                })
+            height = video_fmt['height']
+            if height in seen_heights:
+                continue
+            seen_heights.add(height)
+            combined.append({
+                'format_id': f"{video_fmt['format_id']}+bestaudio",
+                'ext': 'mp4',
+                'resolution': f"{height}p (+AUDIO)",
+                'filesize': 'Unknown',
+                'type': 'video+audio',
+                'quality': height + 1000
+            })
         
         # Special 4K combined format
-        combined.append({
-            'format_id': 'bestvideo[height>=2160]+bestaudio/best[height>=2160]',
-            'ext': 'mp4',
-            'resolution': '4K ULTRA (+AUDIO)',
-            'filesize': 'Unknown',
-            'type': 'video+audio',
-            'quality': 5000
-        })
+        combined.append(dict(ULTRA_4K_FORMAT))
         
         return combined
     
-    def deduplicate_and_sort_formats(self, formats):
-        """Remove duplicates and sort formats by quality"""
-        seen = set()
-        unique_formats = []
-        
-        for f in formats:
-            key = (f['resolution'], f['type'], f['quality'])
-            if key not in seen:
-                seen.add(key)
-                unique_formats.append(f)
-        
-        # Sort by quality (highest first)
-        unique_formats.sort(key=lambda x: x['quality'], reverse=True)
-        
-        return unique_formats
+    def sort_formats(self, formats):
+        """Sort formats in place by quality (highest first)"""
+        formats.sort(key=itemgetter('quality'), reverse=True)
+        return formats
     
     def get_quality_value(self, resolution, format_dict=None):
-        """Convert resolution to numeric value for sorting"""
-        resolution_map = {
-            '144P': 144, '240P': 240, '360P': 360, '480P': 480,
-            '720P': 720, '1080P': 1080, '1440P': 1440, '2160P': 2160,
-            '4320P': 4320, '4K': 2160, '2K': 1440,
-            'BEST': 10000, 'N/A': 0, 'MP3 AUDIO (192KBPS)': 1
-        }
+        """Convert an upper-case resolution string to numeric value for sorting"""
+        # The format height is the most reliable value when yt-dlp provides it
+        height = format_dict.get('height') if format_dict else None
+        if height:
+            return height
         
-        # Try to get from resolution map
-        resolution_upper = resolution.upper()
-        quality = resolution_map.get(resolution_upper, 0)
+        # Audio-only streams rank by bitrate, above the MP3 entry and below every video
+        abr = format_dict.get('abr') if format_dict else None
+        if abr and format_dict.get('vcodec') == 'none':
+            return MP3_FORMAT['quality'] + abr / 1000
         
-        # Extract from resolution string like "2160p"
+        quality = RESOLUTION_MAP.get(resolution, 0)
+        
+        # Plain resolution strings like "2160P"
+        if quality == 0 and resolution.endswith('P') and resolution[:-1].isdigit():
+            quality = int(resolution[:-1])
+        
+        # Resolution strings with a suffix like "1080P60"
         if quality == 0:
-            match = re.search(r'(\d+)p', resolution_upper)
+            match = _HEIGHT_RE.search(resolution)
             if match:
                 quality = int(match.group(1))
         
-        # If not found, try to extract from height
-        if quality == 0 and format_dict and format_dict.get('height'):
-            quality = format_dict['height']
-        
         return quality
     
     def format_duration(self, seconds):
         """Format duration in seconds to HH:MM:SS"""
         if not seconds:
             return "Unknown"
-        hours = seconds // 3600
-        minutes = (seconds % 3600) // 60
-        seconds = seconds % 60
-        if hours > 0:
-            return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-        else:
+        hours, remainder = divmod(int(seconds), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        # Most videos are under an hour
+        if not hours:
             return f"{minutes:02d}:{seconds:02d}"
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
     
     def format_filesize(self, size_bytes):
         """Format file size in human readable format"""
@@ -345,53 +719,72 @@ class YouTubeDownloader:
         
         try:
             size_float = float(size_bytes)
-            for unit in ['B', 'KB', 'MB', 'GB']:
-                if size_float < 1024.0:
-                    return f"{size_float:.1f} {unit}"
-                size_float /= 1024.0
-            return f"{size_float:.1f} TB"
-        except (TypeError, ValueError):
+            # Each unit step is 10 bits, so the bit length picks the unit directly
+            unit_index = min(max((int(size_float).bit_length() - 1) // 10, 0), len(SIZE_UNITS) - 1)
+            return f"{size_float / (1 << (unit_index * 10)):.1f} {SIZE_UNITS[unit_index]}"
+        except (TypeError, ValueError, OverflowError):
             return "Unknown"
     
     def progress_hook(self, d, progress_callback=None):
         """Progress hook for yt-dlp"""
-        if d['status'] == 'downloading':
-            total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
-            downloaded_bytes = d.get('downloaded_bytes', 0)
+        status, total_bytes, total_estimate, downloaded_bytes, speed, eta, filename = map(
+            d.get, ('status', 'total_bytes', 'total_bytes_estimate', 'downloaded_bytes', 'speed', 'eta', 'filename')
+        )
+        filename = filename or ''
+        
+        if status == 'downloading':
+            # Per-file state; the progress dict is reused for every update of the file,
+            # so callbacks should copy what they keep (app.py merges it into its own dict)
+            state = self._hook_state.get(filename)
+            if state is None:
+                state = self._hook_state[filename] = {
+                    'total_bytes': None,
+                    'last_emit_ts': 0.0,
+                    'progress': {
+                        'status': 'downloading',
+                        'percent': 0,
+                        'speed': '0 MB/s',
+                        'eta': 'Unknown',
+                        'filesize': 'Unknown',
+                        'filename': os.path.basename(filename),
+                        'message': 'Downloading...'
+                    },
+                }
             
-            percent = 0
-            if total_bytes > 0:
-                percent = (downloaded_bytes / total_bytes) * 100
+            # The UI polls for progress, so emitting more often than this is wasted work
+            now = time.monotonic()
+            if now - state['last_emit_ts'] < PROGRESS_MIN_INTERVAL:
+                return
+            state['last_emit_ts'] = now
             
-            speed = d.get('speed', 0)
-            eta = d.get('eta', 0)
+            progress_info = state['progress']
+            total_bytes = total_bytes or total_estimate or 0
+            if total_bytes != state['total_bytes']:
+                state['total_bytes'] = total_bytes
+                progress_info['filesize'] = self.format_filesize(total_bytes)
             
-            progress_info = {
-                'status': 'downloading',
-                'percent': round(percent, 1),
-                'speed': f"{speed / 1024 / 1024:.1f} MB/s" if speed else "0 MB/s",
-                'eta': f"{eta} seconds" if eta else "Unknown",
-                'filesize': self.format_filesize(total_bytes),
-                'filename': os.path.basename(d.get('filename', '')),
-                'message': 'Downloading...'
-            }
+            progress_info['percent'] = round((downloaded_bytes or 0) / total_bytes * 100, 1) if total_bytes else 0
+            progress_info['speed'] = f"{speed * BYTES_TO_MB:.1f} MB/s" if speed else "0 MB/s"
+            progress_info['eta'] = f"{eta} seconds" if eta else "Unknown"
             
-            if progress_callback:
-                progress_callback(progress_info)
-                
-        elif d['status'] == 'finished':
+        elif status == 'finished':
+            self._hook_state.pop(filename, None)
             progress_info = {
                 'status': 'completed',
                 'percent': 100,
                 'speed': '0 MB/s',
                 'eta': '0 seconds',
-                'filesize': self.format_filesize(d.get('total_bytes', 0)),
-                'filename': os.path.basename(d.get('filename', '')),
+                'filesize': self.format_filesize(total_bytes),
+                'filename': os.path.basename(filename),
                 'message': 'Download completed!'
             }
-            
-            if progress_callback:
-                progress_callback(progress_info)
+        
+        else:
+            self._hook_state.pop(filename, None)
+            return
+        
+        if progress_callback:
+            progress_callback(progress_info)
     
     def download(self, url, format_id, download_type, downloads_folder, progress_callback=None):
         """Download video or audio with 4K and auto-merge support"""
@@ -403,40 +796,69 @@ class YouTubeDownloader:
             os.makedirs(downloads_folder, exist_ok=True)
             
             # Configure download options
-            ydl_opts = self.get_download_options(download_type, format_id, downloads_folder, progress_callback)
+            ydl_opts = self.get_download_options(download_type, format_id, downloads_folder, progress_callback, url=url)
+            
+            # Reuse info from a recent get_video_info() call to avoid a second extraction
+            cached_info = self.get_cached_info(url)
+            
+            # Only a miss writes the info JSON, into a private folder removed once the download ends
+            info_dir = nullcontext()
+            if cached_info is None:
+                info_dir = tempfile.TemporaryDirectory(prefix='yt-info-')
+                ydl_opts['writeinfojson'] = True
+                ydl_opts['outtmpl'] = {'default': ydl_opts['outtmpl'], 'infojson': os.path.join(info_dir.name, 'info')}
+                # That folder is never reused, so the instance is not worth pooling
+                ydl_context = yt_dlp.YoutubeDL(ydl_opts)
+            else:
+                ydl_context = self.pooled_ydl(ydl_opts)
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+            with info_dir, ydl_context as ydl:
+                if cached_info:
+                    logger.info("Using cached video info for: %s", url)
+                    info = ydl.process_ie_result(yt_dlp.YoutubeDL.sanitize_info(cached_info), download=True)
+                else:
+                    info = ydl.extract_info(url, download=True)
                 filename = ydl.prepare_filename(info)
+                if cached_info is None:
+                    self.load_info_json(url, os.path.join(info_dir.name, 'info.info.json'))
+                
+                # yt-dlp records the final path of every file it wrote, after post-processing
+                written_paths = [rd['filepath'] for rd in info.get('requested_downloads', []) if rd.get('filepath')]
+                if written_paths:
+                    logger.info("Downloaded file: %s", written_paths[-1])
+                    return written_paths[-1]
                 
+                # Otherwise work out the path from the output template
                 # Handle MP3 conversion
                 if download_type == 'audio' or format_id == 'mp3':
                     base_name = os.path.splitext(filename)[0]
                     mp3_file = base_name + '.mp3'
                     
                     if os.path.exists(mp3_file):
-                        logger.info(f"MP3 file created: {mp3_file}")
+                        logger.info("MP3 file created: %s", mp3_file)
                         return mp3_file
                     else:
-                        logger.warning(f"MP3 conversion may have failed, returning original file: {filename}")
+                        logger.warning("MP3 conversion may have failed, returning original file: %s", filename)
                         return filename
                 else:
                     if os.path.exists(filename):
-                        logger.info(f"Video file created: {filename}")
+                        logger.info("Video file created: %s", filename)
                         return filename
                     else:
                         base_name = os.path.splitext(filename)[0]
-                        for ext in ['.mp4', '.mkv', '.webm', '.m4a']:
-                            possible_file = base_name + ext
-                            if os.path.exists(possible_file):
-                                logger.info(f"Found file with different extension: {possible_file}")
-                                return possible_file
+                        possible_file = self.find_file_with_extension(base_name, FALLBACK_EXTENSIONS)
+                        if possible_file:
+                            logger.info("Found file with different extension: %s", possible_file)
+                            return possible_file
                 
-                logger.error(f"Downloaded file not found: {filename}")
+                logger.error("Downloaded file not found: %s", filename)
+                self.invalidate_info(url)
                 return None
                 
         except Exception as e:
-            logger.error(f"Download error: {str(e)}")
+            logger.error("Download error: %s", e)
+            # Cached format URLs may have expired; make the next attempt re-extract
+            self.invalidate_info(url)
             if progress_callback:
                 progress_callback({
                     'status': 'error',
@@ -444,23 +866,76 @@ class YouTubeDownloader:
                 })
             return None
     
-    def get_download_options(self, download_type, format_id, downloads_folder, progress_callback):
+    def find_file_with_extension(self, base_name, extensions):
+        """Return base_name plus the first extension in the list that exists, using one directory scan"""
+        directory = os.path.dirname(base_name) or '.'
+        prefix = os.path.basename(base_name)
+        try:
+            with os.scandir(directory) as entries:
+                found = {
+                    entry.name[len(prefix):] for entry in entries
+                    if entry.name.startswith(prefix) and entry.is_file()
+                }
+        except OSError:
+            return None
+        
+        for ext in extensions:
+            if ext in found:
+                return base_name + ext
+        return None
+    
+    async def download_many(self, jobs, concurrency=DOWNLOAD_CONCURRENCY):
+        """Download several videos concurrently; each job is a dict of download() arguments"""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        # Sized per call so a larger concurrency is not capped by a shared pool
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        
+        async def run_job(job):
+            async with semaphore:
+                return await loop.run_in_executor(executor, functools.partial(self.download, **job))
+        
+        try:
+            return await asyncio.gather(*(run_job(job) for job in jobs))
+        finally:
+            # Don't block the event loop waiting on downloads if the batch is cancelled
+            executor.shutdown(wait=False)
+    
+    def get_download_options(self, download_type, format_id, downloads_folder, progress_callback, url=''):
         """Get appropriate download options with 4K and merge support"""
         base_opts = {
             'outtmpl': os.path.join(downloads_folder, '%(title)s.%(ext)s'),
-            'progress_hooks': [lambda d: self.progress_hook(d, progress_callback)],
             'quiet': True,
             'no_warnings': False,
+            'concurrent_fragment_downloads': 8,  # Parallel DASH/HLS fragment fetching
+            'http_chunk_size': 10 * 1024 * 1024,
+            'hls_prefer_native': True,
+            'retries': 3,
+            'fragment_retries': 3,
+            'socket_timeout': 20,
         }
         
+        # yt-dlp output is quiet, so the hook is only useful when someone is listening
+        if progress_callback is not None:
+            base_opts['progress_hooks'] = [functools.partial(self.progress_hook, progress_callback=progress_callback)]
+        
+        # Multi-connection downloads when aria2c is installed; yt-dlp only reports
+        # "finished" for external downloaders, so keep the native one for progress
+        if self.aria2c_path and progress_callback is None:
+            base_opts.update({
+                'external_downloader': {'default': 'aria2c'},
+                'external_downloader_args': {'aria2c': ['-x', '8', '-s', '8', '-k', '1M']},
+            })
+        
         # Add platform-specific options
-        url_specific_opts = self.get_extractor_opts('')
+        url_specific_opts = self.get_extractor_opts(url)
         base_opts.update(url_specific_opts)
         
         if download_type == 'audio' or format_id == 'mp3':
-            # Audio download
+            # Audio download, from the chosen audio stream when one was picked
             base_opts.update({
-                'format': 'bestaudio/best',
+                'format': 'bestaudio/best' if format_id == 'mp3' else format_id,
                 'postprocessors': [{
                     'key': 'FFmpegExtractAudio',
                     'preferredcodec': 'mp3',
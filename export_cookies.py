@@ -2,31 +2,69 @@
 import browser_cookie3
 import sys
 
-def export_cookies():
+# Browsers to read cookies from, in default order
+BROWSERS = {
+    'chrome': browser_cookie3.chrome,
+    'firefox': browser_cookie3.firefox,
+}
+
+# Remembers which browser worked last time so it is tried first
+BROWSER_MARKER = '.cookie_browser'
+
+def get_browser_order():
+    """Return browser names to try, with the last successful one first"""
     try:
-        # Try to get cookies from Chrome
-        cookies = browser_cookie3.chrome(domain_name='youtube.com')
-    except:
+        with open(BROWSER_MARKER) as f:
+            preferred = f.read().strip()
+    except OSError:
+        preferred = None
+    
+    order = list(BROWSERS)
+    if preferred in BROWSERS:
+        order.remove(preferred)
+        order.insert(0, preferred)
+    return order
+
+def load_browser_cookies():
+    """Load YouTube cookies from the first browser that has them"""
+    for name in get_browser_order():
         try:
-            # Try Firefox if Chrome fails
-            cookies = browser_cookie3.firefox(domain_name='youtube.com')
-        except:
-            print("Could not extract cookies from browser")
-            return
+            cookies = BROWSERS[name](domain_name='youtube.com')
+        except Exception:
+            continue
+        try:
+            with open(BROWSER_MARKER, 'w') as f:
+                f.write(name)
+        except OSError:
+            pass
+        return cookies
+    
+    return None
+
+def format_cookie(cookie):
+    """Format a cookie as a Netscape cookies.txt line"""
+    return '\t'.join((
+        cookie.domain,
+        'TRUE' if cookie.domain.startswith('.') else 'FALSE',
+        cookie.path,
+        'TRUE' if cookie.secure else 'FALSE',
+        str(int(cookie.expires)) if cookie.expires else '0',
+        cookie.name,
+        cookie.value
+    )) + '\n'
+
+def export_cookies():
+    cookies = load_browser_cookies()
+    if cookies is None:
+        print("Could not extract cookies from browser")
+        return
     
     # Write cookies to file in Netscape format
     with open('cookies.txt', 'w') as f:
-        for cookie in cookies:
-            if cookie.domain.endswith('youtube.com'):
-                f.write('\t'.join([
-                    cookie.domain,
-                    'TRUE' if cookie.domain.startswith('.') else 'FALSE',
-                    cookie.path,
-                    'TRUE' if cookie.secure else 'FALSE',
-                    str(int(cookie.expires)) if cookie.expires else '0',
-                    cookie.name,
-                    cookie.value
-                ]) + '\n')
+        f.writelines(
+            format_cookie(cookie) for cookie in cookies
+            if cookie.domain.endswith('youtube.com')
+        )
     
     print("Cookies exported to cookies.txt")
 